@@ -1,15 +1,101 @@
 # -*- coding: utf-8 -*-
 
 # Standard imports
-import urllib2
+import atexit
+import bisect
+import ConfigParser
+import itertools
+import math
+import re
+import threading
+from multiprocessing.pool import ThreadPool
+
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2
+    from backports.functools_lru_cache import lru_cache
 
 # Third-party imports
-import justext
 import gensim
+import lxml.html
+import numpy
 import requests
+import tldextract
+from requests.adapters import HTTPAdapter
+from requests.compat import cookielib, quote_plus
+
+
+# Module constants
+# a single session keeps connections alive and pools them between the Bing
+# API queries of all claims and the pages fetched for them
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+# the session stores no cookies, the jar would otherwise grow with every page
+# fetched during the run, be walked on every request and be modified by many
+# threads at once
+_SESSION.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains=[]))
+
+# the number of threads fetching and comparing the found pages of a query
+_COMPARE_THREADS = 10
+
+# the maximum number of decoded bytes read from a single found page, which is
+# more than enough for the text of an article
+_MAX_PAGE_SIZE = 1536 * 1024
+
+# the number of bytes of a found page read at once, compressed pages are
+# decoded chunk by chunk, so that the limit above applies to the decoded page
+_PAGE_CHUNK_SIZE = 64 * 1024
+
+# a token, a run of alphabetic characters as in gensim.utils.tokenize
+_TOKEN_RE = re.compile(r'(?:(?!\d)\w)+', re.UNICODE)
+
+# the maximum length of a Bing API query
+_MAX_QUERY_LENGTH = 1400
+
+# the hostname of a URL, the scheme being optional
+_HOSTNAME_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*://)?([^/:?#]*)', re.I)
+
+# splits hostnames by the Public Suffix List snapshot bundled with
+# tldextract, without fetching the list over the network
+_TLD_EXTRACT = tldextract.TLDExtract(suffix_list_urls=None)
+
+# the elements holding the text blocks of a page
+_PARAGRAPH_TAGS = ('p', 'li', 'h1', 'h2', 'h3')
+
+# a <meta> element declaring the character encoding of a page, looked for
+# only at the beginning of the page
+_META_CHARSET_RE = re.compile(br'<meta[^>]+charset', re.I)
+_META_CHARSET_RANGE = 4096
+
+# the character encoding of pages declaring none, as used by justext
+_DEFAULT_ENCODING = 'utf-8'
+
+# the minimum length of a text block to be considered a paragraph
+_MIN_PARAGRAPH_LENGTH = 40
+
+# the maximum number of paragraphs of a single page to compare with the claim
+_MAX_PARAGRAPHS = 500
+
+# the minimum number of distinct claim tokens a paragraph has to contain to
+# be compared with the claim
+_MIN_CLAIM_OVERLAP = 2
+
+# the tolerance for rounding errors when pruning paragraphs by the upper
+# bounds of their similarity
+_BOUND_TOLERANCE = 1e-9
+
+
+# the [skipsites] options of each configuration file, read only once and
+# written back to the file when the application exits
+_SKIPSITES = {}
+_SKIPSITES_LOCK = threading.Lock()
 
 
 # Module functions
+@lru_cache(maxsize=4096)
 def _extract_hostname(url):
     """
     Extracts the hostname from a given URL.
@@ -20,16 +106,10 @@ def _extract_hostname(url):
     Returns:
         The hostname of the given URL.
     """
-    if (url.index("://") > -1):
-        hostname = url.split('/')[2]
-    else:
-        hostname = url.split('/')[0]
-
-    hostname = hostname.split(':')[0].split('?')[0]
-
-    return hostname;
+    return _HOSTNAME_RE.match(url).group(1)
 
 
+@lru_cache(maxsize=4096)
 def _extract_root_domain(url):
     """
     Extracts only the root domain from a given URL.
@@ -40,21 +120,216 @@ def _extract_root_domain(url):
     Returns:
         The root domain of the given URL.
     """
-    domain = _extract_hostname(url)
-    split = domain.split('.')
-    arr_length = len(split)
+    extracted = _TLD_EXTRACT(_extract_hostname(url))
+    
+    # hostnames without a public suffix (i.e. IP addresses) are kept whole
+    return extracted.registered_domain or extracted.domain
+
+
+@lru_cache(maxsize=32)
+def _get_bing_exclusions(ignored_sites):
+    """
+    Returns the part of a Bing API query excluding the given sites.
+    
+    Args:
+        ignored_sites: A tuple of domain names of sites to not search.
+        
+    Returns:
+        A tuple of the format (exclusions, ends), where 'exclusions' joins the
+        " OR site:" clauses of all the sites and 'ends' holds the positions
+        at which the individual clauses end.
+    """
+    clauses = [" OR site:" + site for site in ignored_sites]
+    ends = []
+    length = 0
+    for clause in clauses:
+        length += len(clause)
+        ends.append(length)
+        
+    return "".join(clauses), tuple(ends)
+
+
+@lru_cache(maxsize=32)
+def _get_google_exclusions(ignored_sites):
+    """
+    Returns the part of a Google search query excluding the given sites.
+    
+    Args:
+        ignored_sites: A tuple of domain names of sites to not search.
+        
+    Returns:
+        The " -site:" clauses of all the sites joined together.
+    """
+    return "".join([" -site:" + site for site in ignored_sites])
+
+
+def _get_skipsites(config_file):
+    """
+    Returns the [skipsites] options of the configuration file.
+    
+    The file is read only on the first call for each configuration file.
+    Options added to the returned dict are saved to the file at exit.
+    
+    Args:
+        config_file: The path to the application configuration file.
+        
+    Returns:
+        A dict mapping the site root domains to their option values, empty if
+        the file has no [skipsites] section.
+    """
+    with _SKIPSITES_LOCK:
+        if config_file not in _SKIPSITES:
+            config = ConfigParser.ConfigParser()
+            config.read(config_file)
+            try:
+                _SKIPSITES[config_file] = dict(config.items('skipsites'))
+            except ConfigParser.NoSectionError:
+                _SKIPSITES[config_file] = {}
+            atexit.register(_save_skipsites, config_file)
+            
+        return _SKIPSITES[config_file]
+
 
+def _save_skipsites(config_file):
+    """
+    Writes the sites added to the [skipsites] options back to the file.
+    
+    Args:
+        config_file: The path to the application configuration file.
+    """
+    config = ConfigParser.ConfigParser()
+    config.read(config_file)
+    
+    added_sites = [(site, value)
+                   for site, value in _SKIPSITES[config_file].items()
+                   if not config.has_option('skipsites', site)]
+    if not added_sites:
+        return
     
-    if (arr_length > 2):
-        # there is a subdomain 
-        domain = split[arr_length - 2] + '.' + split[arr_length - 1]
+    if not config.has_section('skipsites'):
+        config.add_section('skipsites')
         
-        # check to see if using a ccTLD (i.e. ".co.uk")
-        if len(split[arr_length - 1]) == 2 and len(split[arr_length - 1]) == 2:
-            # this is using a ccTLD
-            domain = split[arr_length - 3] + '.' + domain
+    for site, value in added_sites:
+        config.set('skipsites', site, value)
         
-    return domain
+    with open(config_file, 'wb') as cfg_file:
+        config.write(cfg_file)
+
+
+def _get_encoding(response):
+    """
+    Returns the character encoding declared for a page by the server.
+    
+    requests reports ISO-8859-1 for text pages without a declared encoding,
+    so only an encoding given explicitly in the Content-Type header is
+    returned, as given there.
+    
+    Args:
+        response: The requests response of the page.
+        
+    Returns:
+        The name of the encoding, or None if none is declared.
+    """
+    content_type = response.headers.get('content-type', '')
+    if 'charset' not in content_type.lower():
+        return None
+    
+    return response.encoding or None
+
+
+def _extract_paragraphs(page, encoding=None):
+    """
+    Extracts the paragraphs of text from an HTML page.
+    
+    A lightweight replacement for boilerplate removal, collects the text of
+    paragraph, list item and heading elements with normalized whitespace,
+    leaving out blocks too short to be a paragraph. At most _MAX_PARAGRAPHS
+    paragraphs are extracted, to bound the work spent on huge pages.
+    
+    Args:
+        page: The HTML source of the page as bytes.
+        encoding: The character encoding declared by the server. If None or
+            unknown to libxml2, the encoding declared by the page itself is
+            used, or UTF-8 if there is none.
+        
+    Returns:
+        A list of the paragraph texts in the order of the page.
+    """
+    parser = None
+    if encoding is not None:
+        try:
+            parser = lxml.html.HTMLParser(encoding=encoding)
+        except LookupError:
+            pass
+        
+    if parser is None:
+        if _META_CHARSET_RE.search(page, 0, _META_CHARSET_RANGE):
+            parser = lxml.html.HTMLParser()
+        else:
+            parser = lxml.html.HTMLParser(encoding=_DEFAULT_ENCODING)
+    
+    tree = lxml.html.fromstring(page, parser=parser)
+    texts = (" ".join(element.text_content().split())
+             for element in tree.iter(*_PARAGRAPH_TAGS))
+    
+    return list(itertools.islice((text for text in texts
+                                  if len(text) >= _MIN_PARAGRAPH_LENGTH),
+                                 _MAX_PARAGRAPHS))
+
+
+def _tokenize(text):
+    """
+    Returns the lowercase tokens of a text.
+    
+    Equivalent to gensim.utils.tokenize with to_lower=True, but finds all the
+    tokens in a single pass of a precompiled regular expression instead of
+    yielding them one by one.
+    
+    Args:
+        text: The text to tokenize.
+        
+    Returns:
+        A list of the lowercase tokens of the text.
+    """
+    return _TOKEN_RE.findall(gensim.utils.to_unicode(text).lower())
+
+
+def _get_bow(dictionary, tokens):
+    """
+    Returns the bag-of-words vector of the given tokens and its length.
+    
+    Tokens missing from the dictionary are left out of the vector, but still
+    count towards its length, so that cosine similarities with vectors over
+    the dictionary stay exact.
+    
+    Args:
+        dictionary: The gensim dictionary mapping tokens to their IDs.
+        tokens: A list of tokens to get the vector for.
+        
+    Returns:
+        A tuple of the format (bag_of_words, length).
+    """
+    bow, missing = dictionary.doc2bow(tokens, return_missing=True)
+    length = math.sqrt(sum(weight * weight for _, weight in bow)
+                       + sum(count * count for count in missing.values()))
+    return bow, length
+
+
+def _dot(bow, weights):
+    """
+    Computes the scalar product of two bag-of-words vectors.
+    
+    For vectors scaled to unit length, this is their cosine similarity.
+    
+    Args:
+        bow: A bag-of-words vector as a list of (token_id, weight) tuples.
+        weights: A dict mapping token IDs to weights of the other vector.
+        
+    Returns:
+        The scalar product of the two vectors.
+    """
+    return sum(weight * weights.get(token_id, 0.0)
+               for token_id, weight in bow)
 
 
 # Module classes
@@ -75,6 +350,8 @@ class BingResponse(object):
             extracted.
         claim_text: The text of the claim retrieved from the article.
         config_file: The path to the application configuration file.
+        detect_copies: Whether pages copied from the article are detected,
+            skipped and their sites added to the sites to skip.
         valid_sites: A subset of response_sites, which was determined as not
             too dissimilar neither too similar, providing a possible candidate
             for a source.
@@ -82,7 +359,7 @@ class BingResponse(object):
     
     # Initialization methods
     def __init__(self, article_text, claim_text, query, ignored_sites,
-                 config_file, api_key):
+                 config_file, api_key, detect_copies=True):
         """
         Initializes an instance of BingResponse object.
         
@@ -94,6 +371,8 @@ class BingResponse(object):
             query: Keyword query to search by.
             config_file: The path to the application configuration file.
             api_key: The API key to use when querying Bing.
+            detect_copies: Whether to detect and skip pages copied from the
+                article, adding their sites to the sites to skip.
         """
         self.api_key = api_key
         self.url = 'https://api.cognitive.microsoft.com/bing/v5.0/search'
@@ -109,15 +388,101 @@ class BingResponse(object):
         self.article_text = article_text
         self.claim_text = claim_text
         self.config_file = config_file
+        self.detect_copies = detect_copies
+        self._skipsites = _get_skipsites(config_file)
+        
+        # tokenize the article and claim and build their dictionary only once,
+        # all the found pages are compared against them; the dictionary is
+        # not updated with the page tokens, as pages are compared concurrently
+        article_tokens = _tokenize(article_text) if detect_copies else []
+        claim_tokens = _tokenize(claim_text)
+        self._claim_token_set = frozenset(claim_tokens)
+        self._dictionary = gensim.corpora.Dictionary([article_tokens,
+                                                      claim_tokens])
+        
+        # scale the vectors to unit length once, so that every cosine
+        # similarity is just a scalar product
+        self._article_unit = dict(gensim.matutils.unitvec(
+            self._dictionary.doc2bow(article_tokens)))
+        claim_unit = gensim.matutils.unitvec(
+            self._dictionary.doc2bow(claim_tokens))
+        self._claim_unit = dict(claim_unit)
+        self._claim_squares = {self._dictionary[token_id]: weight * weight
+                               for token_id, weight in claim_unit}
+        
+        # only the claim tokens contribute to a scalar product with the claim,
+        # the paragraph vectors are projected onto them as short dense vectors
+        self._claim_columns = {token_id: column
+                               for column, (token_id, _)
+                               in enumerate(claim_unit)}
+        self._claim_vector = numpy.array([weight for _, weight in claim_unit])
+        
+        # the pages are independent, overlap waiting for their download
+        pool = ThreadPool(_COMPARE_THREADS)
+        try:
+            response_tuples = pool.map(self.__compare_site,
+                                       [website['url']
+                                        for website in self.response_sites])
+        finally:
+            pool.close()
+            pool.join()
         
         self.valid_sites = []
-        for website in self.response_sites:
-            response_tuple = self.__compare_site(website['url'])
+        for website, response_tuple in zip(self.response_sites,
+                                           response_tuples):
             if response_tuple != None:
                 self.valid_sites.append((response_tuple[0],
                                          website['name'],
                                          website['snippet'],
                                          response_tuple[1]))
+    
+    @classmethod
+    def bulk(cls, claims, ignored_sites, config_file, api_key,
+             detect_copies=True, processes=8):
+        """
+        Creates BingResponse objects for multiple claims concurrently.
+        
+        Querying Bing and fetching the found pages is network-bound, so the
+        claims are processed by a pool of threads sharing a single HTTP
+        session.
+        
+        Args:
+            claims: A list of (article_text, claim_text, query) tuples for
+                the claims to search sources for.
+            ignored_sites: Sites to not include in the search response.
+            config_file: The path to the application configuration file.
+            api_key: The API key to use when querying Bing.
+            detect_copies: Whether to detect and skip pages copied from the
+                article, adding their sites to the sites to skip.
+            processes: The number of threads to use.
+            
+        Returns:
+            A list of BingResponse objects in the same order as 'claims'.
+        """
+        if not claims:
+            return []
+        
+        def create_response(claim):
+            article_text, claim_text, query = claim
+            try:
+                return cls(article_text, claim_text, query, ignored_sites,
+                           config_file, api_key, detect_copies)
+            except SystemExit as error:
+                # pool threads do not propagate SystemExit, pass it on
+                return error
+        
+        pool = ThreadPool(processes)
+        try:
+            responses = pool.map(create_response, claims)
+        finally:
+            pool.close()
+            pool.join()
+        
+        for response in responses:
+            if isinstance(response, SystemExit):
+                raise response
+            
+        return responses
         
     @staticmethod
     def __get_google_link(keywords, ignored_sites):
@@ -126,25 +491,18 @@ class BingResponse(object):
         
         Args:
             keywords: Keyword query to search by.
-            ignored_sites" Sites to not include in the search response.
+            ignored_sites: Sites to not include in the search response.
         Returns:
             A link to Google search for the query.
         """
-        query = keywords
-        for (x, site) in enumerate(ignored_sites):
-            query += " -site:" + site
-        try:
-            query = urllib2.quote(unicode(query, 'utf-8'), safe='')
-        except KeyError:
-            try:
-                query = urllib2.quote(query, safe='')
-            except:
-                query = ""
-        except:
-            query = ""
+        query = keywords + _get_google_exclusions(tuple(ignored_sites))
+        
+        # quote the UTF-8 bytes of the query directly, quoting unicode
+        # strings fails for non-ASCII characters
+        if not isinstance(query, bytes):
+            query = query.encode('utf-8')
             
-        query = "https://google.com/search?q=" + query
-        return query
+        return "https://google.com/search?q=" + quote_plus(query, safe='')
     
     def __get_response_sites(self):
         """
@@ -155,7 +513,7 @@ class BingResponse(object):
         """
         payload = {'q' : self.__build_query(self.query, self.ignored_sites),
                    'count': 20}
-        response = requests.get(self.url, headers=self.headers, params=payload)
+        response = _SESSION.get(self.url, headers=self.headers, params=payload)
         
         try:
             result = response.json()['webPages']['value']
@@ -178,19 +536,15 @@ class BingResponse(object):
             A Bing API query.
         """
         query = keywords + " NOT (link:wikipedia.org"
-	if 'wikipedia.org' not in ignored_sites:
-            query += 'OR site:wikipedia.org'
-        length = len(query)
-        for site in ignored_sites:
-            append = " OR site:" + site
-            length += len(append)
-            if length <= 1400:
-                query += append
-            else:
-                break 
-        query += ")"
-    
-        return query
+        if 'wikipedia.org' not in ignored_sites:
+            query += " OR site:wikipedia.org"
+            
+        # include as many of the site clauses as fit in the query
+        exclusions, ends = _get_bing_exclusions(tuple(ignored_sites))
+        count = bisect.bisect_right(ends, _MAX_QUERY_LENGTH - len(query))
+        
+        return "".join([query, exclusions[:ends[count - 1] if count else 0],
+                        ")"])
     
     def __compare_site(self, url):
         """
@@ -198,7 +552,8 @@ class BingResponse(object):
         
         As a side effect, adds sites that are too similar in text, and thus
         presumably just a copy of the original article, to the list of ignored
-        sites for future queries. Updates the configuration file with these.
+        sites for future queries. The configuration file is updated with these
+        when the application exits.
         
         Args:
             url: The URL of the page to compare.
@@ -209,82 +564,128 @@ class BingResponse(object):
             too similar, meaning it is probably copied text from Wikipedia.
         """
         try:
-            page_open = urllib2.urlopen(url, timeout=7)
-            actual_url = page_open.geturl()
-            page = page_open.read()
+            # stream the page, so that only its beginning is downloaded and
+            # kept in memory for large pages
+            page_open = _SESSION.get(url, timeout=7, stream=True)
+            try:
+                page_open.raise_for_status()
+                actual_url = page_open.url
+                encoding = _get_encoding(page_open)
+                
+                chunks = []
+                size = 0
+                for chunk in page_open.iter_content(_PAGE_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= _MAX_PAGE_SIZE:
+                        break
+                page = b"".join(chunks)[:_MAX_PAGE_SIZE]
+            finally:
+                page_open.close()
         except:
             return None
         
         try:
-            paragraphs = justext.justext(page, [])
+            paragraphs = _extract_paragraphs(page, encoding)
         except:
             return None
-        # get the whole page text
-        page_text = "\n".join([paragraph.text for paragraph in paragraphs])
-        
-        # tokenize
-        text_tokens = [token for token
-                       in gensim.utils.tokenize(page_text, to_lower=True)]
-        article_tokens = [token for token
-                          in gensim.utils.tokenize(self.article_text,
-                                                   to_lower=True)]
-        claim_tokens = [token for token
-                        in gensim.utils.tokenize(self.claim_text,
-                                                 to_lower=True)]
-        
-        # initialize the dictionary
-        dictionary = gensim.corpora.Dictionary([text_tokens, claim_tokens])
-        
-        # get bag-of-words representations
-        text_bow = dictionary.doc2bow(text_tokens)
-        article_bow = dictionary.doc2bow(article_tokens)
-        claim_bow = dictionary.doc2bow(claim_tokens)
-        
-        page_similarity = gensim.matutils.cossim(text_bow, article_bow)
-        """
-        if page_similarity >= 0.95:
-            # add page to the list of sites to skip
-            root_domain = _extract_root_domain(actual_url)
-            config = ConfigParser.ConfigParser()
-            config.read(self.config_file)
-            cfg_file = open(self.config_file, 'wb')
-            try:
-                config.get('skipsites', root_domain)
-            except ConfigParser.NoOptionError:
-                # the page is not yet in defined the file, include
-                config.set('skipsites', root_domain, 'true')
-                self.ignored_sites.append(root_domain)
-            else:
-                # the site is included in the file, do not modify the settings
-                pass
-            
-            config.write(cfg_file)
-            cfg_file.close()
-            
-            return None
+        # tokenize every paragraph once
+        paragraph_tokens = [_tokenize(paragraph) for paragraph in paragraphs]
         
-        elif page_similarity < 0.4:
-            # the page is too dissimilar - do not include
-            return None
-        """
+        if self.detect_copies:
+            # the tokens of the whole page text are just the concatenation of
+            # the paragraph tokens
+            text_tokens = [token for tokens in paragraph_tokens
+                           for token in tokens]
+            text_bow, text_length = _get_bow(self._dictionary, text_tokens)
+            
+            page_similarity = (_dot(text_bow, self._article_unit)
+                               / text_length if text_length > 0 else 0.0)
+            if page_similarity >= 0.95:
+                # add page to the list of sites to skip
+                root_domain = _extract_root_domain(actual_url).lower()
+                with _SKIPSITES_LOCK:
+                    if root_domain not in self._skipsites:
+                        # the page is not yet defined in the file, include
+                        self._skipsites[root_domain] = 'true'
+                        self.ignored_sites.append(root_domain)
+                    # otherwise the site is included in the file, do not
+                    # modify the settings
+                
+                return None
+            """
+            elif page_similarity < 0.4:
+                # the page is too dissimilar - do not include
+                return None
+            """
         similar_paragraph = ""
         max_similarity = 0
         
-        for paragraph in paragraphs:
-            paragraph_tokens = gensim.utils.tokenize(paragraph.text,
-                                                     to_lower=True)
-            paragraph_bow = dictionary.doc2bow(paragraph_tokens)
+        # paragraphs sharing almost no tokens with the claim cannot be the
+        # most similar ones, do not bother getting their vectors; for the
+        # others, the length of the claim vector restricted to the shared
+        # tokens is an upper bound of their similarity (by the Cauchy-Schwarz
+        # inequality)
+        min_overlap = min(_MIN_CLAIM_OVERLAP, len(self._claim_token_set))
+        bounds = {}
+        for x, tokens in enumerate(paragraph_tokens):
+            shared = self._claim_token_set.intersection(tokens)
+            if len(shared) >= min_overlap:
+                bounds[x] = math.sqrt(sum(self._claim_squares[token]
+                                          for token in shared))
+        
+        candidates = sorted(bounds)
+        vectors = {}
+        if candidates:
+            # score the most promising paragraph first, the paragraphs bounded
+            # below its similarity cannot be the most similar ones
+            first = max(candidates, key=bounds.get)
+            bow, length = vectors[first] = _get_bow(self._dictionary,
+                                                    paragraph_tokens[first])
+            if length > 0:
+                similarity = _dot(bow, self._claim_unit) / length
+                candidates = [x for x in candidates
+                              if bounds[x] >= similarity - _BOUND_TOLERANCE]
+                
+        paragraph_vectors = [vectors[x] if x in vectors
+                             else _get_bow(self._dictionary,
+                                           paragraph_tokens[x])
+                             for x in candidates]
+        
+        if paragraph_vectors and len(self._claim_vector) > 0:
+            # score all paragraphs at once with a single product of a small
+            # dense matrix instead of calling cossim paragraph by paragraph
+            rows, columns, weights = [], [], []
+            for row, (bow, _) in enumerate(paragraph_vectors):
+                for token_id, weight in bow:
+                    column = self._claim_columns.get(token_id)
+                    if column is not None:
+                        rows.append(row)
+                        columns.append(column)
+                        weights.append(weight)
             
-            paragraph_similarity = gensim.matutils.cossim(paragraph_bow,
-                                                          claim_bow)
-            if max_similarity < paragraph_similarity:
-                max_similarity = paragraph_similarity
-                similar_paragraph = paragraph.text
-            """   
-            if max_similarity >= 0.9:
-                # the paragraph is too similar, do not include site
-                return None
-            """
+            paragraph_matrix = numpy.zeros((len(paragraph_vectors),
+                                            len(self._claim_vector)))
+            paragraph_matrix[rows, columns] = weights
+            
+            products = paragraph_matrix.dot(self._claim_vector)
+            norms = numpy.array([norm for _, norm in paragraph_vectors])
+            
+            # empty paragraphs have a similarity of 0, as in cossim
+            similarities = numpy.zeros(len(paragraph_vectors))
+            nonempty = norms > 0
+            similarities[nonempty] = products[nonempty] / norms[nonempty]
+            
+            # argmax keeps the first of equally similar paragraphs
+            best = int(similarities.argmax())
+            if max_similarity < similarities[best]:
+                max_similarity = similarities[best]
+                similar_paragraph = paragraphs[candidates[best]]
+        """   
+        if max_similarity >= 0.9:
+            # the paragraph is too similar, do not include site
+            return None
+        """
         similar_paragraph = (similar_paragraph[:1000]
                              if len(similar_paragraph) > 1000
                              else similar_paragraph)
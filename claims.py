@@ -1,12 +1,139 @@
 # Standard imports
 import math
+from collections import deque
+from itertools import islice, takewhile
+
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2
+    from backports.functools_lru_cache import lru_cache
 
 # Third-party imports
 import numpy
-from gensim.utils import tokenize
+from gensim.utils import to_unicode, tokenize
+
+
+# Module constants
+# reciprocals of the natural logarithms of the bases used for term
+# frequencies and IDFs
+_INV_LN15 = 1.0 / math.log(15.0)
+_INV_LN2 = 1.0 / math.log(2.0)
 
 
 # Module functions
+def _count_terms(text):
+    """
+    Counts the occurrences of the lowercase tokens of the text.
+    
+    The text is tokenized once into an array of integer token IDs local to
+    the text, which are then counted in a single pass.
+    
+    Args:
+        text: The text whose tokens are to be counted.
+    
+    Returns:
+        A tuple of the format (token_ids, counts), where token_ids is a dict
+        mapping the lowercase tokens to their IDs and counts is an array of
+        the token counts indexed by these IDs.
+    """
+    token_ids = {}
+    ids = numpy.fromiter((token_ids.setdefault(token.lower(), len(token_ids))
+                          for token in tokenize(text)),
+                         dtype=numpy.int32)
+    
+    return token_ids, numpy.bincount(ids, minlength=len(token_ids))
+
+
+def _get_idf_array(dictionary, num_documents):
+    """
+    Returns the IDFs of all the tokens of a dictionary indexed by their IDs.
+    
+    The array is computed once and kept on the dictionary object, so that
+    it is shared by all the claims using the dictionary. Tokens without a
+    document frequency get an IDF of 0.
+    
+    Args:
+        dictionary: A dictionary with token document frequencies.
+        num_documents: The full count of the articles processed to get the
+            'dictionary' dictionary.
+    
+    Returns:
+        An array of the IDFs of the tokens indexed by the token IDs.
+    """
+    cached = getattr(dictionary, '_finder_idfs', None)
+    if cached is not None and cached[0] == num_documents:
+        return cached[1]
+    
+    dfs = dictionary.dfs
+    ids = numpy.fromiter(dfs.keys(), dtype=numpy.int64, count=len(dfs))
+    counts = numpy.fromiter(dfs.values(), dtype=numpy.float64,
+                            count=len(dfs))
+    
+    idf_array = numpy.zeros(max(dictionary.token2id.values()) + 1
+                            if dictionary.token2id else 0)
+    known = counts > 0
+    idf_array[ids[known]] = ((math.log(num_documents)
+                              - numpy.log(counts[known])) * _INV_LN2)
+    
+    dictionary._finder_idfs = (num_documents, idf_array)
+    
+    return idf_array
+
+
+def prepare_dictionary(dictionary, num_documents):
+    """
+    Computes the data kept on a dictionary for building claim queries.
+    
+    Calling this before the dictionary is handed to forked worker processes
+    lets the workers share the data instead of each computing its own copy.
+    
+    Args:
+        dictionary: A dictionary with token document frequencies.
+        num_documents: The full count of the articles processed to get the
+            'dictionary' dictionary.
+    """
+    _get_idf_array(dictionary, num_documents)
+
+
+def _get_title_keywords(title):
+    """
+    Returns the lowercase unicode tokens of an article title.
+    
+    Args:
+        title: The title of the article.
+    
+    Returns:
+        A list of the title tokens in their original order.
+    """
+    return [keyword.lower() for keyword in tokenize(title)]
+
+
+def _get_percentiles(sorted_values, percentiles):
+    """
+    Returns the percentiles of already sorted values.
+    
+    The percentiles are linearly interpolated between the closest ranks,
+    as done by numpy.percentile by default, without sorting the values again.
+    
+    Args:
+        sorted_values: A non-empty sorted array of values.
+        percentiles: A percentile or an array of percentiles to compute, in
+            the range from 0 to 100.
+    
+    Returns:
+        The value of the percentile or an array of the percentile values.
+    """
+    positions = (numpy.asarray(percentiles, dtype=numpy.float64) / 100.0
+                 * (sorted_values.size - 1))
+    lower = numpy.floor(positions).astype(int)
+    upper = numpy.ceil(positions).astype(int)
+    
+    return (sorted_values[lower]
+            + (positions - lower) * (sorted_values[upper]
+                                     - sorted_values[lower]))
+
+
 def _split_in_sents(string):
     """
     Splits the string into sentences.
@@ -21,33 +148,36 @@ def _split_in_sents(string):
         A list of strings that are presumed to be the individual sentences
         of the original string. 
     """
-    if isinstance(string, str):
-        string = unicode(string, "utf-8")
+    string = to_unicode(string)
     
     # split the string by '.' to get naive candidates for sentences
     # remove empty results
-    split = filter(lambda x: x != '', string.split("."))
+    split = [part for part in string.split(".") if part]
+    
     sentences = []
-    sentence_part = []
+    last = len(split) - 1
+    
+    # the index of the first part of the sentence being built
+    start = 0
     
     # build the sentence from parts
     for x, elem in enumerate(split):
-        sentence_part.append(elem)
         # we have reached the end of the string
-        if x == len(split) - 1:
-            sentences.append(".".join(sentence_part))
+        if x == last:
+            sentences.append(".".join(split[start:]))
             break
         
-        # move to the next part of the original string
-        part_next = split[x+1]
+        # get the presumed words of the next part of the original string
+        aList = [word for word in split[x+1].split(" ") if word]
         
-        # split the next part to presumed words
-        aList = filter(lambda z: z != '', part_next.split(" "))
+        # the last presumed word of the current part, without splitting the
+        # whole part
+        last_word = elem.rsplit(" ", 1)[-1]
         
         # the next part of the string is empty
         if len(aList) < 1:
-            sentences.append(".".join(sentence_part))
-            sentence_part = []
+            sentences.append(".".join(split[start:x+1]))
+            start = x + 1
         # heuristic to distinguish between '.' character ending a sentence
         # and any other use
         # other use is indicated by these conditions:
@@ -58,13 +188,11 @@ def _split_in_sents(string):
         #      this indicates a use for an abbreviation
         elif (len(aList) == 1
               or aList[0].lower() == aList[0]
-              or (sentence_part[-1].split(" ")[-1].lower()
-                  != sentence_part[-1].split(" ")[-1]
-                  and len(sentence_part[-1]) < 5)):
+              or (len(elem) < 5 and last_word.lower() != last_word)):
             continue
         else:
-            sentences.append(".".join(sentence_part))
-            sentence_part = []
+            sentences.append(".".join(split[start:x+1]))
+            start = x + 1
             
     return sentences
 
@@ -80,13 +208,21 @@ class Claim(object):
         claim_type: Indicates whether the claim was harvested from the text
             before the [citation needed] template (equal to B) or after it (F).
         article_text: The text of the whole article.
+        term_counts: The token counts of the article text as returned by
+            _count_terms, shared by the claims of a single article.
+        title_keywords: The tokens of the article title as returned by
+            _get_title_keywords, shared by the claims of a single article.
+        sentence_tokens: A dict mapping sentences to their lowercase tokens,
+            shared by the claims of a single article.
     """
     
     # Class constants
     TAGS = ["very_large", "large", "medium_large", "medium", "medium_small",
             "small", "very_small"]
 
-    def __init__(self, title, text, claim_type, article_text):
+    def __init__(self, title, text, claim_type, article_text,
+                 term_counts=None, title_keywords=None,
+                 sentence_tokens=None):
         """
         Initializes an instance of a Claim object.
         
@@ -96,12 +232,25 @@ class Claim(object):
             claim_type: Indicates whether the claim was harvested from the text
                 before the [citation needed] template (equal to B) or after it
                 (F).
-            
+            article_text: The text of the whole article.
+            term_counts: The token counts of the article text as returned by
+                _count_terms. Computed from 'article_text' when first needed
+                if not given.
+            title_keywords: The tokens of the article title as returned by
+                _get_title_keywords. Computed from 'title' when first needed
+                if not given.
+            sentence_tokens: A dict mapping sentences to their lowercase
+                tokens to be shared with the other claims of the article. A
+                new one is created if not given.
         """
         self.title = title
         self.text = text
         self.claim_type = claim_type
         self.article_text = article_text
+        self.term_counts = term_counts
+        self.title_keywords = title_keywords
+        self.sentence_tokens = (sentence_tokens
+                                if sentence_tokens is not None else {})
         
     def get_query(self, dictionary, article_count):
         """
@@ -113,71 +262,63 @@ class Claim(object):
                 'dictionary' dictionary.
         """
         sentences = _split_in_sents(self.text)
+        
+        if self.term_counts is None:
+            self.term_counts = _count_terms(self.article_text)
+            
+        if self.title_keywords is None:
+            self.title_keywords = _get_title_keywords(self.title)
     
         tokens, token_tfs = self.__get_tokens_with_tfs(sentences,
-                                                       self.article_text)
+                                                       self.term_counts)
         token_idfs = self.__get_idfs(tokens, dictionary, article_count)
-        tfidfs = []
-        
-        for x, token in enumerate(tokens):
-            tfidfs.append(token_tfs[x] * token_idfs[x])
         
         # scale tfidfs to have values between 0 and 1    
-        tfidfs = self.__normalize(tfidfs)
+        tfidfs = self.__normalize(token_tfs * token_idfs)
     
-        tokens_with_idfs = []        
-        for x, token in enumerate(tokens):
-            tokens_with_idfs.append((token, tfidfs[x]))
-            
-        # sort the tokens decreasing based on their tfidf value
-        tokens_with_idfs.sort(key=lambda tup: tup[1], reverse = True)
+        # rank the tokens decreasing based on their tfidf value, the stable
+        # sort keeps tokens with equal values in the order of the claim
+        ranking = numpy.argsort(-tfidfs, kind="mergesort")
         
-        cutoff = self.__get_cutoff(tfidfs)
+        # the reversed ranking gives the values sorted for all the percentile
+        # computations without sorting them again
+        sorted_tfidfs = tfidfs[ranking[::-1]]
         
-        # get the value of percentile at which to cutoff adding more keywords
-        perc = numpy.percentile(tfidfs, cutoff)
+        cutoff = self.__get_cutoff(sorted_tfidfs)
         
-        prequery = set()
+        # get the value of percentile at which to cutoff adding more keywords
+        perc = _get_percentiles(sorted_tfidfs, cutoff)
         
-        # get the keywords for the query in no particular order
-        for token in tokens_with_idfs:
-            if token[1] >= perc:
-                prequery.add(token[0])
-                if (len(prequery) >= 10):
-                    break
-            else:
+        # get the positions of the keywords for the query in the claim, the
+        # tokens are unique so their positions identify them
+        selected = []
+        for index in ranking:
+            if tfidfs[index] < perc or len(selected) >= 10:
                 break
-                
-        query = []
+            
+            selected.append(index)
         
         # get the keywords in the order in which the words appeared in the
         # claim
-        for token in tokens:
-            if token in prequery:
-                query.append(token)
+        query = [tokens[index] for index in sorted(selected)]
                 
         if len(query) > 8:
             query = query[:7]
             
-        title_array = []
-        for keyword in tokenize(self.title):
-            title_array.append(keyword)
+        query_set = set(query)
+        query = deque(query)
             
         # append the title to the start of the query, as the position has an
         # effect on the result
-        for keyword in reversed(title_array):
-            if isinstance(keyword, str):
-                keyword = unicode(token, "utf-8")
-            
-            keyword = keyword.lower()
-            keyword = keyword.encode("utf-8")
-            
-            if keyword not in query:
-                query.insert(0, keyword)
+        for keyword in reversed(self.title_keywords):
+            if keyword not in query_set:
+                query.appendleft(keyword)
+                query_set.add(keyword)
         
-        self.query = (" ").join(query)
+        # the query is only encoded once it is complete
+        self.query = (u" ").join(query).encode("utf-8")
         
-    def __get_tokens_with_tfs(self, sentences, text):
+    def __get_tokens_with_tfs(self, sentences, term_counts):
         """
         Returns tokens for the text with their weighted term frequencies.
         
@@ -212,136 +353,132 @@ class Claim(object):
         
         Args:
             sentences: A list of individual sentences.
-            text: The full text of the original article.
+            term_counts: The token counts of the full text of the original
+                article as returned by _count_terms.
         
         Returns:
             A tuple of the format (tokens, term_frequencies).
         """
         # Local constants
         COEFFICIENT = 0.6
-        
-        tokens = []
-        token_weights = []
-        token_tfs = []
-        
-        i = 1
-        
-        # get weights for the tokens in the claim
-        while i < 4:
+        # the weights of the tokens in the closest, second and third closest
+        # sentence
+        SENTENCE_WEIGHTS = (1, COEFFICIENT ** 2, COEFFICIENT ** 3)
+        
+        # the tokens in the order of their first appearance, keyed by their
+        # lowercase unicode form in the weight map
+        token_order = []
+        token_weights = {}
+        
+        # get weights for the tokens in the last (up to) three sentences of
+        # the claim
+        for i in range(1, min(4, len(sentences) + 1)):
             # weight increment decreases the further away the sentence is from
             # the [citation needed] template, as the semantic weight probably
             # decreases with the distance as well.
-            for token in tokenize(sentences[-i]):
-                if isinstance(token, str):
-                    token = unicode(token, "utf-8")
-                
-                token = token.lower()
-                
-                if token in tokens:
+            weight = SENTENCE_WEIGHTS[i - 1]
+            
+            for token in self.__get_sentence_tokens(sentences[-i]):
+                if token in token_weights:
                     if i != 1:
-                        token_weights[tokens.index(token)] += (
-                            1 * (COEFFICIENT ** i))
+                        token_weights[token] += weight
                 else:
-                    tokens.append(token.encode("utf-8"))
-                    token_tfs.append(0)
-                    if i != 1:
-                        token_weights.append(float(1 * (COEFFICIENT ** i)))
-                    else:
-                        token_weights.append(1)
-                    
-            if sentences[-i] == sentences[0]:
-                break
-            
-            i += 1
+                    token_order.append(token)
+                    token_weights[token] = weight
             
         if self.claim_type == 'F' and len(sentences) > 3:
             # add the tokens found as an introduction with weight 0.7 if they
             # are not already in the list of tokens
-            for token in tokenize(sentences[0]):
-                if isinstance(token, str):
-                    token = unicode(token, "utf-8")
-                
-                token = token.lower()
-                
-                if token not in tokens:
-                    tokens.append(token.encode("utf-8"))
-                    token_tfs.append(0)
-                    token_weights.append(0.7)
-            
-        # get the actual term frequencies
-        for word in tokenize(text):                
-            if isinstance(word, str):
-                word = unicode(word, "utf-8")
-                
-            word = word.lower()
+            for token in self.__get_sentence_tokens(sentences[0]):
+                if token not in token_weights:
+                    token_order.append(token)
+                    token_weights[token] = 0.7
             
-            for x, token in enumerate(tokens):
-                if isinstance(token, str):
-                    token = unicode(token, "utf-8")
-                    
-                token = token.lower()
-                
-                if token == word:
-                    token_tfs[x] += 1
-                    break
+        # get the actual term frequencies from the article token counts
+        token_ids, counts = term_counts
+        token_tfs = numpy.array([counts[token_ids[token]]
+                                 if token in token_ids else 0
+                                 for token in token_order],
+                                dtype=numpy.float64)
+        weights = numpy.array([token_weights[token] for token in token_order],
+                              dtype=numpy.float64)
                 
         # get weighted term frequencies
-        for x, token in enumerate(tokens):
-            token_tfs[x] = math.log(token_tfs[x] + 14, 15.0) * token_weights[x]
+        weighted_tfs = numpy.log(token_tfs + 14) * _INV_LN15 * weights
                 
-        return tokens, self.__normalize(token_tfs)
+        return token_order, self.__normalize(weighted_tfs)
+    
+    def __get_sentence_tokens(self, sentence):
+        """
+        Returns the lowercase tokens of a sentence of the claim.
+        
+        The claims of a paragraph are joined with the claims preceding them,
+        so the same sentences recur in several claims of an article. The
+        tokens are therefore looked up in the shared 'sentence_tokens' dict
+        first and only tokenized if the sentence has not been seen yet.
+        
+        Args:
+            sentence: The sentence to be tokenized.
+            
+        Returns:
+            A list of the lowercase tokens of the sentence.
+        """
+        tokens = self.sentence_tokens.get(sentence)
+        
+        if tokens is None:
+            tokens = [token.lower() for token in tokenize(sentence)]
+            self.sentence_tokens[sentence] = tokens
+            
+        return tokens
     
     @staticmethod
     def __get_idfs(tokens, dictionary, num_documents):
         """
-        Returns a list of IDFs of the corresponding tokens.
+        Returns an array of IDFs of the corresponding tokens.
         
-        The returned list has the same ordering as the tokens input.
+        The returned array has the same ordering as the tokens input. Tokens
+        not present in the dictionary get an IDF of 0.
         
         Args:
-            tokens: A list of the tokens for which to retrieve the inverse
-                document frequencies.
+            tokens: A list of the unicode tokens for which to retrieve the
+                inverse document frequencies.
             dictionary: A dictionary with token document frequencies.
             num_documents: The full count of the articles processed to get the
                 'dictionary' dictionary.
         """
-        idfs = []
-        for i in tokens:            
-            try:
-                uni = unicode(i, "utf-8")
-                tok_id = dictionary.token2id[uni]
-                idf = math.log((1.0 * num_documents)/dictionary.dfs[tok_id],
-                                2.0)
-                idfs.append(idf)
-            except:
-                idfs.append(0)
+        idf_array = _get_idf_array(dictionary, num_documents)
+        token2id = dictionary.token2id
+        
+        ids = numpy.fromiter((token2id.get(token, -1) for token in tokens),
+                             dtype=numpy.int64, count=len(tokens))
+        known = ids >= 0
+        
+        idfs = numpy.zeros(len(tokens))
+        idfs[known] = idf_array[ids[known]]
                 
         return idfs
     
     @staticmethod
-    def __normalize(list_to_normalize):
+    def __normalize(values):
         """
-        Returns the list of numbers scaled to contain values between 0 and 1.
+        Returns the numbers scaled to contain values between 0 and 1.
         
         Args:
-            list_to_normalize: The list of numbers to be scaled.
+            values: An array of the numbers to be scaled.
         
         Returns:
-            The given list normalized to contain only values between 0 and 1.
+            The given numbers as an array normalized to contain only values
+            between 0 and 1.
         """
-        list_sum = sum(list_to_normalize)
+        values = numpy.asarray(values, dtype=numpy.float64)
+        values_sum = values.sum()
         
-        if list_sum == 0:
-            return list_to_normalize
-
-        normalized_list = []
-        
-        for elem in list_to_normalize:
-            normalized_list.append(1.0 * elem/list_sum)
+        if values_sum == 0:
+            return values
             
-        return normalized_list
+        return values / values_sum
     
-    def __get_cutoff(self, tfidfs):
+    def __get_cutoff(self, sorted_tfidfs):
         """
         Returns TFIDF percentile at which to cut off the addition of keywords.
         
@@ -357,27 +494,23 @@ class Claim(object):
         should be stopped.
         
         Args:
-            tfidfs: A list of tfidf values for the tokens to be included in the
-                query.
+            sorted_tfidfs: A sorted array of tfidf values for the tokens to be
+                included in the query.
                 
         Returns:
             The percentile at which the addition of more keywords to the query
             should be stopped.
         """
-        perc_value = 90
-        cumulative = 0
-        cur_max = 0
-        position = 0
-        
-        while (perc_value >= 0):
-            diff = (numpy.percentile(tfidfs, perc_value + 10)
-                    - numpy.percentile(tfidfs, perc_value))
-            cumulative += diff
-            if diff > cur_max:
-                position = perc_value
-                cur_max = diff        
-            
-            perc_value -= 10
+        # get the 0th, 10th, ..., 100th percentiles at once, the decrease in
+        # the n-th interval is the difference of its bounds
+        diffs = numpy.diff(_get_percentiles(sorted_tfidfs,
+                                            numpy.arange(0, 101, 10)))
+        cumulative = diffs.sum()
+        cur_max = diffs.max()
+        
+        # on ties, prefer the interval with the highest percentile
+        position = (90 - 10 * int(diffs[::-1].argmax())
+                    if cur_max > 0 else 0)
         
         # get the amount of spread between the TFIDF values
         spread = self.__get_tag(cumulative)
@@ -423,7 +556,9 @@ class Claim(object):
             
         return tag
     
-    def __get_strategy(self, spread, breaking_point, break_rate):
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def __get_strategy(spread, breaking_point, break_rate):
         """
         Returns the percentile at which the adding of keywords should stop.
         
@@ -431,7 +566,8 @@ class Claim(object):
         decrease in the TFIDF values and the ratio of this rate of decrease and
         overall spread.
         
-        Note that the percentile computation was acquired empirically.
+        Note that the percentile computation was acquired empirically. As the
+        arguments only take on a handful of values, the results are cached.
         
         Args:
             spread: The overall spread of TFIDF values of the potential
@@ -441,6 +577,10 @@ class Claim(object):
                 {0, 10, 20, ..., 90}.
             break_rate: The ratio of the decrease slope at the point of highest
                 decrease and the overall spread.
+                
+        Returns:
+            The percentile at which the addition of more keywords to the query
+            should be stopped.
         """
         strategy = breaking_point
         
@@ -448,15 +588,15 @@ class Claim(object):
         rates = [3, 3, 2, 2, 2, 1, 1]
         
         for i in range(0, 7):
-            if spread == self.TAGS[i]:
+            if spread == Claim.TAGS[i]:
                 for j in range(0, 7):
-                    if break_rate == self.TAGS[j]:
-                        strategy = self.__lower_by_max(breaking_point,
-                                                       coeff[i] * (j + 1),
-                                                       rates[i])
+                    if break_rate == Claim.TAGS[j]:
+                        strategy = Claim.__lower_by_max(breaking_point,
+                                                        coeff[i] * (j + 1),
+                                                        rates[i])
                         break
     
-        return breaking_point
+        return strategy
     
     @staticmethod
     def __lower_by_max(breaking_point, maximum, change):
@@ -476,13 +616,15 @@ class Claim(object):
             that keeps 'breaking_point' a non-negative number. If this is not
             possible, returns the original value of 'breaking_point'.
         """
-        while maximum >= 0:
-            if breaking_point - maximum >= 0:
-                return breaking_point - maximum
+        if maximum <= breaking_point:
+            return breaking_point - maximum if maximum >= 0 else breaking_point
         
-            maximum -= change
-    
-        return breaking_point
+        # the number of times 'change' has to be subtracted from 'maximum' to
+        # get it below 'breaking_point', rounded up
+        steps = -(-(maximum - breaking_point) // change)
+        maximum -= steps * change
+        
+        return breaking_point - maximum if maximum >= 0 else breaking_point
                 
 
 class ArticleClaims(object):
@@ -494,6 +636,14 @@ class ArticleClaims(object):
         title: The title of the article.
         text: The plain text of the article enhanced with '$$CNMARK$$' symbols
             in place of the [citation needed] Wikipedia templates.
+        term_counts: The token counts of the article text as returned by
+            _count_terms, shared by all the claims of the article. None until
+            a claim is found.
+        title_keywords: The tokens of the title as returned by
+            _get_title_keywords, shared by all the claims of the article.
+            None until a claim is found.
+        sentence_tokens: A dict mapping sentences to their lowercase tokens,
+            shared by all the claims of the article.
     """
     
     def __init__(self, article_id, article_title, article_text):
@@ -511,6 +661,38 @@ class ArticleClaims(object):
         self.title = article_title
         self.text = article_text
         self.claims = []
+        self.term_counts = None
+        self.title_keywords = None
+        self.sentence_tokens = {}
+        
+    def build_queries(self, dictionary, article_count):
+        """
+        Gets the keyword queries for all the claims of the article.
+        
+        The claims share the token counts of the article, so the queries of a
+        single article are best built together, e.g. in the worker process
+        that found the claims.
+        
+        The token data shared by the claims is only needed to build the
+        queries and is released afterwards, so that it is not sent back along
+        with the claims from a worker process.
+        
+        Args:
+            dictionary: A dictionary with token document frequencies.
+            article_count: The full count of the articles processed to get the
+                'dictionary' dictionary.
+        """
+        for claim in self.claims:
+            claim.get_query(dictionary, article_count)
+            
+        self.term_counts = None
+        self.title_keywords = None
+        self.sentence_tokens = {}
+        
+        for claim in self.claims:
+            claim.term_counts = None
+            claim.title_keywords = None
+            claim.sentence_tokens = self.sentence_tokens
         
     def from_text(self):
         """
@@ -529,6 +711,11 @@ class ArticleClaims(object):
         list or an example. Otherwise, the template is treated as if it relates
         to the text before it (marked as claim_type "B").
         """ 
+        # most articles have no [citation needed] templates at all, do not
+        # split them into lines
+        if "$$CNMARK$$" not in self.text:
+            return
+        
         lines = self.text.split("\n")
         
         # search for claims in article, paragraphs in wiki markup are divided
@@ -537,11 +724,11 @@ class ArticleClaims(object):
             if "$$CNMARK$$" in line:
                 # handle multiple claims
                 claims = line.split("$$CNMARK$$")
+                last = len(claims) - 1
                     
                 for claim_no, claim in enumerate(claims):
-                    claim_type = "-"
                     # we have reached the last claim in the paragraph
-                    if claim_no == len(claims) - 1:
+                    if claim_no == last:
                         break
                     # ignore short claims, as they do not carry enough semantic
                     # information on their own
@@ -565,20 +752,17 @@ class ArticleClaims(object):
                         # the next part of paragraph is small, the ":" probably
                         # relates to a list that follows, or the next paragraph
                         else:
+                            # the list items following the paragraph, if any
+                            items = list(takewhile(
+                                lambda next_line: "*" in next_line,
+                                islice(lines, line_no + 1, None)))
                             
                             # the next part is a list
-                            if "*" in lines[line_no+1]:
-                                i = 1
-                                while  "*" in lines[line_no+i]:
-                                    claim = "".join([claim, lines[line_no+i]])
-                                    i += 1
+                            if items:
+                                claim = "".join([claim] + items)
                             # the next part is the next paragraph
-                            else:
-                                try:
-                                    claim = " ".join([claim,
-                                                      lines[line_no + 1]])
-                                except IndexError:
-                                    pass
+                            elif line_no + 1 < len(lines):
+                                claim = " ".join([claim, lines[line_no + 1]])
                                 
                     else:
                         # join up to 3 multiple claims in paragraph, as they
@@ -589,6 +773,13 @@ class ArticleClaims(object):
                              claims[claim_no-1] if claim_no-1 >= 0 else "",
                              claims[claim_no]])
 
+                    # the article is only tokenized once it has a claim
+                    if self.term_counts is None:
+                        self.term_counts = _count_terms(self.text)
+                        self.title_keywords = _get_title_keywords(self.title)
+                    
                     self.claims.append(Claim(self.title, claim, claim_type,
-                                             self.text))    
+                                             self.text, self.term_counts,
+                                             self.title_keywords,
+                                             self.sentence_tokens))    
     
@@ -10,14 +10,83 @@
 import bz2
 import multiprocessing
 import re
-from xml.etree.cElementTree import iterparse
+import threading
 
 from gensim import utils
 from gensim.corpora.wikicorpus import *
-from claims import ArticleClaims
+from lxml import etree
+from claims import ArticleClaims, prepare_dictionary
+
+
+# Module constants
+# the RE_P* patterns imported from gensim are already compiled, the local
+# ones are compiled here once as well
+_NEWLINES_RE = re.compile("\n+")
+_BRACE_RE = re.compile(r"[{}]")
+_BASE_URL_RE = re.compile(r"^https?:\/\/[[\w]*\.?]?wikipedia\.org")
+
+# the number of articles handed to a worker process at once, and the number
+# of such batches per process that may be read ahead of the collected results
+_BATCH_SIZE = 10
+_PREFETCH_BATCHES = 4
+
+# the markup substitutions applied until the text stops changing, grouped by
+# the character every match of the group starts with
+_TAG_SUBSTITUTIONS = (
+    (RE_P0, ""),  # remove comments
+    (RE_P1, ""),  # remove footnotes
+    (RE_P9, ""),  # remove outside links
+    (RE_P10, ""),  # remove math content
+    (RE_P11, ""),  # remove all remaining tags
+)
+_LINK_SUBSTITUTIONS = (
+    (RE_P14, ""),  # remove categories
+    (RE_P5, "\\3"),  # remove urls, keep description
+    (RE_P6, "\\2"),  # simplify links, keep description only
+)
+
+
+# Module variables
+# the dictionary and article count used to build the claim queries, set in
+# each worker process by _init_worker
+_DICTIONARY = None
+_ARTICLE_COUNT = None
 
 
 # Module functions
+def _init_worker(dictionary, article_count):
+    """
+    Stores the data needed to build claim queries in a worker process.
+    
+    Args:
+        dictionary: A dictionary with token document frequencies.
+        article_count: The full count of the articles processed to get the
+            'dictionary' dictionary.
+    """
+    global _DICTIONARY, _ARTICLE_COUNT
+    _DICTIONARY = dictionary
+    _ARTICLE_COUNT = article_count
+
+
+def _get_template_name(template):
+    """
+    Returns the lowercase name of a Wiki template.
+    
+    Only the part of the template before the first '|' is lowercased, so
+    long templates are not copied as a whole.
+    
+    Args:
+        template: The Wiki template.
+        
+    Returns:
+        The name of the template without the enclosing braces.
+    """
+    end = template.find("|")
+    name = template[:end] if end >= 0 else template
+    
+    return name.lower().replace("{", "").replace("}", "").strip()
+
+
 def is_cn(template, set_citation):
     """
     Determines if a Wiki template is a [Citation needed] template.
@@ -30,8 +99,7 @@ def is_cn(template, set_citation):
         True if a template is deemed to be a [Citation needed] template, False
         otherwise.
     """
-    text = (template.lower().split("|")[0]
-            .replace("{", "").replace("}", "").strip())
+    text = _get_template_name(template)
     
     if text in set_citation:
         return True
@@ -50,8 +118,7 @@ def is_quote(template, identifier):
         True if a template is deemed to be a [Quote] template, False
         otherwise.
     """
-    text = (template.lower().split("|")[0]
-            .replace("{", "").replace("}", "").strip())
+    text = _get_template_name(template)
     if text == identifier:
         return True
     return False
@@ -106,56 +173,61 @@ def replace_citation_templates(s, set_citation, quote_identifier,
     """
 
     # Find the start and end position of each template by finding the opening
-    # '{{' and closing '}}'
-    n_open, n_close = 0, 0
+    # '{{' and the '}' balancing all the braces opened since, walking only
+    # the positions of the braces found in a single scan of the text
+    braces = [brace.start() for brace in _BRACE_RE.finditer(s)]
     starts, ends = [], []
-    in_template = False
-    prev_c = None
-    for i, c in enumerate(iter(s)):
-        if not in_template:
-            if c == '{' and c == prev_c:
-                starts.append(i - 1)
-                in_template = True
-                n_open = 1
-        if in_template:
-            if c == '{':
-                n_open += 1
-            elif c == '}':
-                n_close += 1
-            if n_open == n_close:
-                ends.append(i)
-                in_template = False
-                n_open, n_close = 0, 0
-        prev_c = c
+    i = 0
+    while i < len(braces) - 1:
+        start = braces[i]
+        if not (s[start] == '{' and braces[i + 1] == start + 1
+                and s[start + 1] == '{'):
+            i += 1
+            continue
+        
+        starts.append(start)
+        
+        depth = 0
+        while i < len(braces):
+            depth += 1 if s[braces[i]] == '{' else -1
+            if depth == 0:
+                break
+            i += 1
+        else:
+            # the template is not closed until the end of the text
+            break
+        
+        ends.append(braces[i])
+        i += 1
+
+    # the text between the templates, computed once
+    gaps = [s[end + 1:start]
+            for start, end in zip(starts + [None], [-1] + ends)]
 
     # Remove all the templates and replace "Citation needed" templates with
     # $$CNMARK$$ and try to preserve quote template information
     aList = []
-    for i, template in enumerate([s[start:end+1]
-                                  for start, end
-                                  in zip(starts, ends)]):
-        aList.append([s[end + 1:start]
-                      for start, end
-                      in zip(starts + [None], [-1] + ends)][i])
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        template = s[start:end + 1]
+        aList.append(gaps[i])
         
-        if is_cn(template, set_citation):			
+        # get the name once for both the checks done by is_cn and is_quote
+        name = _get_template_name(template)
+        
+        if name in set_citation:
             aList.append("$$CNMARK$$")
-        elif is_quote(template, quote_identifier):
-            pattern = re.compile("\n+")
+        elif name == quote_identifier:
             while (len(aList) != 0 and
-                   re.match(pattern, aList[len(aList) - 1])):
+                   _NEWLINES_RE.match(aList[len(aList) - 1])):
                 del aList[-1]
                 
             aList.append('\n')
             aList.append(get_quote(template, text_identifier))
 
     if not aList:
-        return ''.join([s[end + 1:start]
-                        for start, end in zip(starts + [None], [-1] + ends)])
+        return ''.join(gaps)
 
-    aList.append([s[end + 1:start]
-                  for start, end
-                  in zip(starts + [None], [-1] + ends)][-1])
+    aList.append(gaps[-1])
     return ''.join(aList)
 
 def get_plain_with_cnmarks(text, set_citation, quote_identifiers):
@@ -163,7 +235,7 @@ def get_plain_with_cnmarks(text, set_citation, quote_identifiers):
     Parse a Wikipedia dump article, returning its plaintext contents
     with a $$CNMARK$$ marker in place of {Citation needed} templates
     """
-    text = re.sub(RE_P2, "", text)  # remove the last list (=languages)
+    text = RE_P2.sub("", text)  # remove the last list (=languages)
     # the wiki markup is recursive (markup inside markup etc)
     # instead of writing a recursive grammar, here we deal with that by removing
     # markup in a loop, starting with inner-most expressions and working outwards,
@@ -175,18 +247,19 @@ def get_plain_with_cnmarks(text, set_citation, quote_identifiers):
     iters = 0
     while True:
         old, iters = text, iters + 1
-        text = re.sub(RE_P0, "", text)  # remove comments
-        text = re.sub(RE_P1, '', text)  # remove footnotes
-        text = re.sub(RE_P9, "", text)  # remove outside links
-        text = re.sub(RE_P10, "", text)  # remove math content
-        text = re.sub(RE_P11, "", text)  # remove all remaining tags
-        text = re.sub(RE_P14, '', text)  # remove categories
-        text = re.sub(RE_P5, '\\3', text)  # remove urls, keep description
-        text = re.sub(RE_P6, '\\2', text)  # simplify links, keep description only
+        # skip the substitutions which cannot match anything
+        if '<' in text:
+            for pattern, replacement in _TAG_SUBSTITUTIONS:
+                text = pattern.sub(replacement, text)
+        if '[' in text:
+            for pattern, replacement in _LINK_SUBSTITUTIONS:
+                text = pattern.sub(replacement, text)
         # remove table markup
-        text = text.replace('||', '\n|')  # each table cell on a separate line
-        text = re.sub(RE_P12, '\n', text)  # remove formatting lines
-        text = re.sub(RE_P13, '\n\\3', text)  # leave only cell content
+        # each table cell on a separate line
+        if '||' in text:
+            text = text.replace('||', '\n|')
+        text = RE_P12.sub('\n', text)  # remove formatting lines
+        text = RE_P13.sub('\n\\3', text)  # leave only cell content
         # remove empty mark-up
         text = text.replace('[]', '')
         if old == text or iters > 2:  # stop if nothing changed between two iterations or after a fixed number of iterations
@@ -196,14 +269,39 @@ def get_plain_with_cnmarks(text, set_citation, quote_identifiers):
     text = text.replace('[', '').replace(']', '')  # promote all remaining markup to plain text
     return text
 
+def _gate(items, slots, stop):
+    """
+    Yields the items, each only once a slot is free.
+    
+    multiprocessing.Pool reads its input in a thread of its own as fast as
+    it can. Taking a slot of the semaphore for each item bounds how far it
+    reads ahead, the slots are released as the results are collected.
+    
+    Args:
+        items: An iterable of the items to yield.
+        slots: A threading.Semaphore with the number of items that may be
+            read ahead.
+        stop: A threading.Event, once set no more items are yielded.
+    """
+    for item in items:
+        slots.acquire()
+        if stop.is_set():
+            return
+        
+        yield item
+
+
 def get_article_claims(args):
     text, lemmatize, title,  pageid, set_citation, quote_identifiers = args
     text = utils.to_unicode(text, 'utf8', errors='ignore')
-    text = utils.decode_htmlentities(text)
+    # most articles have no entities, do not copy the whole text for them
+    if '&' in text:
+        text = utils.decode_htmlentities(text)
     plaintext = get_plain_with_cnmarks(text, set_citation, quote_identifiers)
     
     claims = ArticleClaims(pageid, title, plaintext)
     claims.from_text()
+    claims.build_queries(_DICTIONARY, _ARTICLE_COUNT)
     
     return claims
 
@@ -220,56 +318,84 @@ class FinderWikiCorpus(WikiCorpus):
         self.set_citation = set_citation
         self.articlecount = article_count
         self.quote_identifiers = quote_identifiers
-            
-        self.base_url = self._get_base_wikipedia_url(bz2.BZ2File(self.fname),
-                                                    filter_namespaces)
+        
+        # read from the dump on first access
+        self._base_url = None
+    
+    @property
+    def base_url(self):
+        """
+        The base URL of the Wikipedia the dump was exported from.
+        
+        Only the beginning of the dump up to the <siteinfo> element is read,
+        once, on first access.
+        """
+        if self._base_url is None:
+            f = self._open_dump()
+            try:
+                self._base_url = self._get_base_wikipedia_url(
+                    f, self.filter_namespaces)
+            finally:
+                f.close()
+        
+        return self._base_url
             
     def get_claims(self):
         """
-        Iterate over the dump, creating a pseudo-XML file called "output" containing claims that are marked
-        with the "citation needed" template
+        Iterate over the dump, yielding an ArticleClaims object with the claims
+        marked with the "citation needed" template and their queries for every
+        article, as soon as the article is processed.
         """
         articles, articles_all = 0, 0
         positions, positions_all = 0, 0
-        texts = ((text, self.lemmatize, title, pageid, self.set_citation, self.quote_identifiers) for title, text, pageid in extract_pages(bz2.BZ2File(self.fname), self.filter_namespaces))
-        pool = multiprocessing.Pool(self.processes)
-        # process the corpus in smaller chunks of docs, because multiprocessing.Pool
-        # is dumb and would load the entire input into RAM at once...
-        claim_list = []
-        for group in utils.chunkize(texts, chunksize=10 * self.processes, maxsize=1):
-            for claims in pool.imap(get_article_claims, group):  # chunksize=10):
-                claim_list.append(claims)
-        pool.terminate()
-
-        #with open("output.finder", "w") as outfile:
-        #    for claim in retList:
-        #        outfile.write(claim)
-        for x in claim_list:
-            for c in x.claims:
-                c.get_query(self.dictionary, self.articlecount)
-            
-        return claim_list
+        texts = ((text, self.lemmatize, title, pageid, self.set_citation, self.quote_identifiers) for title, text, pageid in extract_pages(self._open_dump(), self.filter_namespaces))
+        # the dictionary is handed to the workers once, so that the queries are
+        # built in parallel along with the claims; the IDFs are computed before
+        # the workers are forked, so that they share a single copy of them with
+        # the dictionary instead of each computing its own
+        prepare_dictionary(self.dictionary, self.articlecount)
+        pool = multiprocessing.Pool(self.processes, _init_worker,
+                                    (self.dictionary, self.articlecount))
+        # multiprocessing.Pool is dumb and would load the entire input into
+        # RAM at once, so the articles read ahead are bounded by the slots;
+        # the dump is read and decompressed by the pool's task thread while the
+        # workers parse the articles, and the parsed articles are collected in
+        # the order they finish
+        slots = threading.Semaphore(_PREFETCH_BATCHES * _BATCH_SIZE
+                                    * self.processes)
+        stop = threading.Event()
+        try:
+            for claims in pool.imap_unordered(get_article_claims,
+                                              _gate(texts, slots, stop),
+                                              chunksize=_BATCH_SIZE):
+                slots.release()
+                yield claims
+        finally:
+            # let the task thread finish if it is waiting for a slot
+            stop.set()
+            slots.release()
+            pool.terminate()
+              
+    def _open_dump(self):
+        """
+        Open the bz2-compressed dump for reading.
+        """
+        return bz2.BZ2File(self.fname)
               
     @staticmethod      
     def _get_base_wikipedia_url(f, filter_namespaces=False):
         """
-        Extract pages from a MediaWiki database dump = open file-like object `f`.
-    
-        Return an iterable over (str, str, str) which generates (title, content, pageid) triplets.
-    
+        Extract the base Wikipedia URL from the <siteinfo> element of a
+        MediaWiki database dump = open file-like object `f`.
+        
+        Return the base URL as a str, e.g. 'https://en.wikipedia.org'.
+        
         """
-        elems = (elem for _, elem in iterparse(f, events=("end",)))
-    
         # We can't rely on the namespace for database dumps, since it's changed
-        # it every time a small modification to the format is made. So, determine
-        # those from the first element we find, which will be part of the metadata,
-        # and construct element paths.
-        elem = next(elems)
-        namespace = get_namespace(elem.tag)
-        ns_mapping = {"ns": namespace}
-        siteinfo_tag = "{%(ns)s}siteinfo" % ns_mapping
-        base_url_path = "./{%(ns)s}base" % ns_mapping
-        pattern = re.compile(r"^https?:\/\/[[\w]*\.?]?wikipedia\.org")
-        for elem in elems:
-            if elem.tag == siteinfo_tag:
-                return pattern.findall(elem.find(base_url_path).text)[0]
+        # it every time a small modification to the format is made. So, match
+        # the elements in any namespace; only the <siteinfo> element is built
+        # by lxml for events, and parsing stops at it, before the first page.
+        for _, elem in etree.iterparse(f, events=("end",),
+                                       tag="{*}siteinfo",
+                                       huge_tree=True, recover=True):
+            return _BASE_URL_RE.findall(elem.findtext("{*}base"))[0]
@@ -63,6 +63,7 @@ if __name__ == '__main__':
     Config.set('general', 'articlecount', wiki.length)
     Config.set('general', 'wordids_path', outp + '_wordids.txt.bz2')
     Config.set('general', 'bing_api_key', 'none')
+    Config.set('general', 'detect_copies', 'true')
     Config.add_section('citation-needed')
     Config.set('citation-needed', 'Citation needed', 'true')
     Config.set('citation-needed', 'Cn', 'true')
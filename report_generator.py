@@ -2,7 +2,15 @@
 import codecs
 
 # Third-party imports
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+
+# Module constants
+# the environment is shared by all reports, compiled templates are kept in
+# memory by it and in a bytecode cache on disk, so that they are not compiled
+# again for every report or run
+_ENV = Environment(loader=FileSystemLoader('templates'), autoescape=True,
+                   bytecode_cache=FileSystemBytecodeCache(), auto_reload=False)
 
 
 # Module functions
@@ -15,12 +23,13 @@ def create_report(article_responses, base_url):
             the report.
         base_url: Base Wikipedia URL to generate links to original articles.
     """
-    env = Environment(loader=FileSystemLoader('templates'), autoescape=True)
-    template = env.get_template('template.html')
-    output_from_parsed_template = template.render(
-        articles=article_responses, base_url=base_url)
+    template = _ENV.get_template('template.html')
     
-    # to save the results
+    # to save the results, the report is written as it is rendered instead of
+    # being built as a whole in memory first; the chunks are written one by
+    # one, as the writelines of the codecs writer would join them all
     with codecs.open("report.html", "wb", 'utf-8') as fh:
-        fh.write(output_from_parsed_template)
+        for chunk in template.stream(articles=article_responses,
+                                     base_url=base_url):
+            fh.write(chunk)
         
\ No newline at end of file
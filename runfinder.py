@@ -36,48 +36,47 @@ import report_generator
 from codecs import ignore_errors
 
 
+# Module constants
+# the number of claims, of one or more articles, searched for sources together
+_CLAIM_BATCH_SIZE = 32
+
+
 # Module functions
-def _get_response_data(article_claims, config_file):
+def _search_batch(batch, skipsites, config_file, detect_copies):
     """
-    Searches for candidate source pages for the given articles and claims.
+    Searches for candidate source pages for the claims of a batch of articles.
     
     Args:
-        article_claims: A list of ArticleClaims objects for the articles
-            searched.
+        batch: A list of ArticleClaims objects whose claims are searched
+            together.
+        skipsites: A list of sites to not search.
         config_file: The path to the application configuration file.
+        detect_copies: Whether to detect and skip pages copied from the
+            articles, adding their sites to the sites to skip.
         
     Returns:
-        A list of ArticleResponse objects to be rendered in the final HTML
-        report.
+        A list of ArticleResponse objects for the articles of the batch.
     """
+    #try:
+    responses = BingResponse.bulk([(claim.article_text, claim.text,
+                                    claim.query)
+                                   for article in batch
+                                   for claim in article.claims],
+                                  skipsites, config_file, api_key,
+                                  detect_copies)
+    #except SystemExit:
+    #    print 'Error: your Bing API key does not appear to be valid'
+    #    sys.exit(1)
+    
+    # the responses are in the order of the claims of the batch
     result = []
-    for article in article_claims:
-        config = ConfigParser.ConfigParser()
-        
-        # read the configuration file again in case the [skipsites] section has
-        # been updated
-        config.read(config_file)
-        
-        try:
-            skipsites = [key for (key, value)
-                         in config.items('skipsites')
-                         if value == 'true']
-        except:
-            pass
-        
+    offset = 0
+    for article in batch:
         claims_responses = []
+        article_responses = responses[offset:offset + len(article.claims)]
+        offset += len(article.claims)
         
-        for claim in article.claims:
-            #try:
-            response = BingResponse(claim.article_text, claim.text,
-                                    claim.query, skipsites, config_file,
-                                    api_key)
-            #except SystemExit:
-            #    print 'Error: your Bing API key does not appear to be valid'
-            #    sys.exit(1)
-            #except:
-            #    pass
-            
+        for claim, response in zip(article.claims, article_responses):
             try:
                 claim_responses = ClaimResponses(claim.text,
                                                  response.google_link,
@@ -85,16 +84,77 @@ def _get_response_data(article_claims, config_file):
                 claims_responses.append(claim_responses)
             except:
                 pass
-            
-            
         
         article_response = ArticleResponse(article.id, article.title,
-                                      claims_responses)
+                                           claims_responses)
         result.append(article_response)
         
     return result
 
 
+def _get_response_data(article_claims, config_file):
+    """
+    Searches for candidate source pages for the given articles and claims.
+    
+    The claims of several articles are searched concurrently, so that the
+    network round trips of articles with few claims overlap as well. Articles
+    without claims are not searched at all, their responses are added to the
+    result right away, so the order of the articles is not kept.
+    
+    Args:
+        article_claims: An iterable of ArticleClaims objects for the articles
+            searched, consumed one article at a time.
+        config_file: The path to the application configuration file.
+        
+    Returns:
+        A list of ArticleResponse objects to be rendered in the final HTML
+        report.
+    """
+    config = ConfigParser.ConfigParser()
+    config.read(config_file)
+    
+    # the configuration is read only once, sites found to be copying
+    # articles during the search are appended to this list by BingResponse,
+    # so that they are skipped for all the following claims
+    try:
+        skipsites = [key for (key, value)
+                     in config.items('skipsites')
+                     if value == 'true']
+    except ConfigParser.NoSectionError:
+        skipsites = []
+    
+    # comparing the found pages with the whole article is the costliest part
+    # of the search, it can be turned off by the [general] detect_copies
+    # option
+    try:
+        detect_copies = config.getboolean('general', 'detect_copies')
+    except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+        detect_copies = True
+    
+    result = []
+    batch = []
+    claim_count = 0
+    for article in article_claims:
+        if not article.claims:
+            result.append(ArticleResponse(article.id, article.title, []))
+            continue
+        
+        batch.append(article)
+        claim_count += len(article.claims)
+        
+        if claim_count >= _CLAIM_BATCH_SIZE:
+            result.extend(_search_batch(batch, skipsites, config_file,
+                                        detect_copies))
+            batch = []
+            claim_count = 0
+            
+    if batch:
+        result.extend(_search_batch(batch, skipsites, config_file,
+                                    detect_copies))
+        
+    return result
+
+
 # Module classes
 class ClaimResponses(object):
     """
@@ -112,6 +172,10 @@ class ClaimResponses(object):
             bing_search_page_snippet, similar_paragraph_found).
     """
     
+    # an instance is created for every claim of the run, do not give each
+    # of them an attribute dict
+    __slots__ = ('claim_text', 'claim_id', 'google_link', 'valid_sites')
+    
     def __init__(self, claim_text, google_link, found_response_tuples):
         """
         Initializes an instance of a ClaimResponses object.
@@ -127,9 +191,7 @@ class ClaimResponses(object):
         self.claim_text = claim_text
         self.claim_id = '-' 
         self.google_link = google_link
-        self.valid_sites = [response_tuple
-                            for response_tuple
-                            in found_response_tuples]
+        self.valid_sites = list(found_response_tuples)
             
 
 class ArticleResponse(object):
@@ -141,10 +203,12 @@ class ArticleResponse(object):
     Attributes:
         article_id: The original Wikipedia ID of the article.
         article_title: The title of the article.
-        claims_responses: A list of ClaimResponses objects for all
-            unsubstantiated claims found in the article.
+        claims: A list of ClaimResponses objects for all unsubstantiated
+            claims found in the article.
     """
     
+    __slots__ = ('article_id', 'article_title', 'claims')
+    
     def __init__(self, article_id, article_title, claims_responses):
         """
         Initializes an instance of an ArticleResponse object.
@@ -157,12 +221,10 @@ class ArticleResponse(object):
         """
         self.article_id = article_id
         self.article_title = article_title
-        self.claims = [response for response in claims_responses]
+        self.claims = list(claims_responses)
         
-        i = 0
-        for claim in self.claims:
+        for i, claim in enumerate(self.claims):
             claim.claim_id = article_id + '-' + str(i)
-            i += 1
     
 
 # Main function
@@ -248,15 +310,14 @@ if __name__ == '__main__':
     
     finderWiki = FinderWikiCorpus(inp, dictionary, article_count, set_citation,
                                   quote_identifiers)
-    article_claims = finderWiki.get_claims()
     base_url = finderWiki.base_url
     
-    logger.info('done searching for unsubstantiated claims')
-    
-    
+    # the claims are searched for sources as soon as their article has been
+    # processed, without keeping all the articles in memory
     logger.info('searching for probable sources, this can take a while')        
-    result = _get_response_data(article_claims, config_file)
-    logger.info('done searching for probable sources')
+    result = _get_response_data(finderWiki.get_claims(), config_file)
+    logger.info('done searching for unsubstantiated claims and probable'
+                ' sources')
     
     logger.info('generating HTML report')
     report_generator.create_report(result, base_url)